@@ -1,12 +1,14 @@
 import asyncio
 import os
+import sys
 import uuid
 import tempfile
+from contextlib import asynccontextmanager
 from io import BytesIO
 from PIL import Image 
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, ValidationError
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -32,6 +34,21 @@ HF_API_KEY = os.getenv("HF_API_KEY")
 HF_API_URL = os.getenv("HF_API_URL", "https://router.huggingface.co")
 HF_MODEL = os.getenv("HF_MODEL", "black-forest-labs/FLUX.1-dev")
 
+# Retrieval over the rag/ knowledge base (built with `python rag/pipeline.py`)
+RAG_ENABLED = os.getenv("RAG_ENABLED", "1").lower() not in ("0", "false", "no")
+RAG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+# Seconds a request may spend on retrieval before answering without context
+RAG_TIME_BUDGET = float(os.getenv("RAG_TIME_BUDGET", "0.3"))
+
+# Persistent chat connections on /ws/chat
+WS_MAX_STREAMS = int(os.getenv("WS_MAX_STREAMS", "4"))            # concurrent replies per connection
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))    # events buffered for a slow client
+WS_CONTROL_QUEUE_SIZE = 16   # unsent pings/pongs/errors before a client counts as not reading
+WS_CLOSE_TIMEOUT = 5.0
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "300"))
+
 
 # Use tempfile.gettempdir() for cross-platform compatibility (Windows/Linux/Mac)
 IMAGE_DIR = os.path.join(tempfile.gettempdir(), "generated_images")
@@ -45,11 +62,37 @@ if not GROQ_API_URL:
 if not HF_API_KEY:
     raise RuntimeError("Set HF_API_KEY in environment (see .env.example)")
 
-app = FastAPI(title="HVA Chatbot (FastAPI)", version="0.1")
+def load_retriever():
+    """
+    Loads MiniLM and opens the vector store once per worker. Runs in a thread
+    at startup; returns None (retrieval disabled) if the rag package or its
+    index is unavailable.
+    """
+    if RAG_DIR not in sys.path:
+        sys.path.append(RAG_DIR)
+    try:
+        from retriever import Retriever
+        retriever = Retriever(k=RAG_TOP_K)
+        retriever.warm_up()
+        return retriever
+    except Exception as e:
+        print(f"[RAG] Retrieval disabled: {e}")
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.retriever = await asyncio.to_thread(load_retriever) if RAG_ENABLED else None
+    yield
+
+
+app = FastAPI(title="HVA Chatbot (FastAPI)", version="0.1", lifespan=lifespan)
+
+ALLOWED_ORIGINS = ["http://localhost:5173", "http://localhost:5174"]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:5174"],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -455,14 +498,50 @@ GEMINI_CREATIVE_OVERRIDE = (
     "as appropriate and provide a natural, creative response."
 )
 
+RAG_CONTEXT_PROMPT = (
+    "Use the following excerpts from the HVA career-guidance knowledge base if they are "
+    "relevant to the user's question. Ignore them if they are not.\n\n"
+)
+
+
+async def retrieve_context(query: str) -> str:
+    """
+    Returns knowledge-base excerpts for `query`, or "" when retrieval is
+    disabled, fails, or exceeds RAG_TIME_BUDGET. Retrieval never holds up the
+    reply: an over-budget lookup keeps running in its thread and warms the
+    retriever's cache for the next request.
+    """
+    retriever = getattr(app.state, "retriever", None)
+    if retriever is None:
+        return ""
+    try:
+        results = await asyncio.wait_for(
+            asyncio.to_thread(retriever.search, query),
+            timeout=RAG_TIME_BUDGET,
+        )
+    except asyncio.TimeoutError:
+        print(f"[RAG] Retrieval exceeded {RAG_TIME_BUDGET}s budget, answering without context")
+        return ""
+    except Exception as e:
+        print(f"[RAG] Retrieval failed: {e}")
+        return ""
+
+    excerpts = []
+    for content, metadata, _score in results:
+        source = os.path.basename(str(metadata.get("source", "")))
+        excerpts.append(f"[{source}]\n{content}" if source else content)
+    return "\n\n---\n\n".join(excerpts)
+
+
 # --- Streaming Helper ---
-async def stream_response(req: ChatRequest):
+async def stream_events(req: ChatRequest):
     """
-    Generator that yields Server-Sent Events (SSE) format strings.
-    Each event contains a JSON chunk of the streamed response.
+    Generator that yields the events of one chat reply as dicts:
+    "chunk" events with the text so far, then "done" or "error".
+    Shared by the SSE and WebSocket transports.
     """
     if not req.message or not req.message.strip():
-        yield f"data: {json.dumps({'error': 'Message content is required.'})}\n\n"
+        yield {'error': 'Message content is required.'}
         return
 
     system_message = {"role": "system", "content": HVA_SYSTEM_PROMPT}
@@ -471,16 +550,24 @@ async def stream_response(req: ChatRequest):
     history_msgs = trim_history(req.history, max_turns=6)
     history_as_dicts = [{"role": m.role, "content": m.content} for m in history_msgs] if history_msgs else []
 
+    model_choice = pick_model_for_request(req.message)
+    model_choice = (model_choice or "groq").lower()
+
+    # Knowledge-base context for text models only; image prompts don't need it
+    context_msgs: List[Dict[str, str]] = []
+    if model_choice != "hf":
+        context = await retrieve_context(req.message)
+        if context:
+            context_msgs.append({"role": "system", "content": RAG_CONTEXT_PROMPT + context})
+
     # Build message list
     messages: List[Dict[str, str]] = [system_message]
+    messages.extend(context_msgs)
     if history_as_dicts:
         messages.extend(history_as_dicts)
 
     messages.append({"role": "user", "content": req.message})
 
-    model_choice = pick_model_for_request(req.message)
-    model_choice = (model_choice or "groq").lower()
-
     # defaults
     temperature = 0.7
     top_p = 0.9
@@ -529,14 +616,14 @@ async def stream_response(req: ChatRequest):
                 "content": chunk_text,
                 "accumulated": accumulated
             }
-            yield f"data: {json.dumps(chunk)}\n\n"
+            yield chunk
 
         # --- final event ---
         completion = {
             "type": "done",
             "content": reply
         }
-        yield f"data: {json.dumps(completion)}\n\n"
+        yield completion
 
     # ------------------ ERRORS ------------------
     except httpx.HTTPStatusError as e:
@@ -545,7 +632,7 @@ async def stream_response(req: ChatRequest):
 
         if model_choice == "gemini" and status in (401, 403, 404):
             try:
-                fallback_msgs = [system_message] + history_as_dicts + [{"role": "user", "content": req.message}]
+                fallback_msgs = [system_message] + context_msgs + history_as_dicts + [{"role": "user", "content": req.message}]
 
                 response = await call_preferred_api(
                     "groq",
@@ -569,24 +656,33 @@ async def stream_response(req: ChatRequest):
                         "content": chunk_text,
                         "accumulated": accumulated
                     }
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    yield chunk
 
                 completion = {
                     "type": "done",
                     "content": reply
                 }
-                yield f"data: {json.dumps(completion)}\n\n"
+                yield completion
 
             except Exception:
-                yield f"data: {json.dumps({'type':'error','detail':'gemini fallback failed'})}\n\n"
+                yield {'type':'error','detail':'gemini fallback failed'}
         else:
-            yield f"data: {json.dumps({'type':'error','detail': body})}\n\n"
+            yield {'type':'error','detail': body}
 
     except httpx.RequestError as e:
-        yield f"data: {json.dumps({'type':'error','detail': str(e)})}\n\n"
+        yield {'type':'error','detail': str(e)}
 
     except Exception as e:
-        yield f"data: {json.dumps({'type':'error','detail': str(e)})}\n\n"
+        yield {'type':'error','detail': str(e)}
+
+
+async def stream_response(req: ChatRequest):
+    """
+    Generator that yields Server-Sent Events (SSE) format strings.
+    Each event contains a JSON chunk of the streamed response.
+    """
+    async for event in stream_events(req):
+        yield f"data: {json.dumps(event)}\n\n"
 
 
 # --- Route Handlers ---
@@ -606,6 +702,217 @@ async def chat_endpoint(req: ChatRequest):
         }
     )
 
+# --- Persistent chat over WebSocket ---
+class ChatConnection:
+    """
+    One /ws/chat connection. Any number of replies stream over it at once,
+    each tagged with the client's stream id. Events for all streams go
+    through one bounded queue drained by a single sender, so a client that
+    reads slowly pauses generation instead of growing server memory.
+    Control frames (pings, pongs, cancellations, errors) use a small queue
+    of their own that the sender drains first and the receive loop never
+    waits on, so cancels and heartbeats keep working while data is stalled.
+    History is kept per session_id so clients only send the new message.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.control: asyncio.Queue = asyncio.Queue(maxsize=WS_CONTROL_QUEUE_SIZE)
+        self.wake = asyncio.Event()
+        self.streams: Dict[str, asyncio.Task] = {}
+        self.histories: Dict[str, List[Message]] = {}
+
+    async def send(self, event: Dict[str, Any]):
+        # Data events: waits for space, which pauses the stream behind it.
+        # Tagged with the sending task so a cancel can purge them.
+        await self.outbox.put((asyncio.current_task(), event))
+        self.wake.set()
+
+    def send_control(self, event: Dict[str, Any]) -> bool:
+        # Never waits. A full control queue means the client has stopped
+        # reading, and the caller drops the connection.
+        try:
+            self.control.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        self.wake.set()
+        return True
+
+    async def sender(self):
+        while True:
+            if not self.control.empty():
+                event = self.control.get_nowait()
+            elif not self.outbox.empty():
+                _, event = self.outbox.get_nowait()
+            else:
+                self.wake.clear()
+                await self.wake.wait()
+                continue
+            await self.websocket.send_json(event)
+
+    def start_stream(self, payload: Dict[str, Any]):
+        stream_id = str(payload.get("id") or "")
+        if not stream_id:
+            return {"type": "error", "detail": "Chat messages need an id."}
+        if stream_id in self.streams:
+            return {"type": "error", "id": stream_id, "detail": "Stream id is already in use."}
+        if len(self.streams) >= WS_MAX_STREAMS:
+            return {"type": "error", "id": stream_id, "detail": f"At most {WS_MAX_STREAMS} concurrent streams."}
+        try:
+            req = ChatRequest(**{k: v for k, v in payload.items() if k not in ("type", "id")})
+        except ValidationError as e:
+            return {"type": "error", "id": stream_id, "detail": str(e)}
+
+        task = asyncio.create_task(self.run_stream(stream_id, req))
+        self.streams[stream_id] = task
+        task.add_done_callback(lambda t: self.forget_stream(stream_id, t))
+        return None
+
+    def forget_stream(self, stream_id: str, task: asyncio.Task):
+        # A cancelled id may already have been reused by a newer stream
+        if self.streams.get(stream_id) is task:
+            del self.streams[stream_id]
+
+    async def run_stream(self, stream_id: str, req: ChatRequest):
+        session = req.session_id
+        if req.history is None and session:
+            req.history = trim_history(self.histories.get(session), max_turns=6)
+        events = stream_events(req)
+        try:
+            async for event in events:
+                if event.get("type") == "done" and session:
+                    self.histories[session] = trim_history(
+                        (req.history or []) + [
+                            Message(role="user", content=req.message),
+                            Message(role="assistant", content=event["content"]),
+                        ],
+                        max_turns=6,
+                    )
+                await self.send({**event, "id": stream_id})
+        finally:
+            # Cancelled while waiting on the outbox: close the generator now
+            # rather than whenever it is garbage collected
+            await events.aclose()
+
+    def cancel_stream(self, stream_id: str) -> bool:
+        # Cancelling the task cancels the awaited httpx request, closing the
+        # upstream connection instead of letting the model finish unread.
+        task = self.streams.pop(stream_id, None)
+        if task is None:
+            return False
+        task.cancel()
+        self.purge_events(task)
+        return True
+
+    def purge_events(self, task: asyncio.Task):
+        # Drop the cancelled stream's queued events so nothing for it follows
+        # "cancelled", and a reused id never mixes old and new events. This
+        # never awaits, so the cancelled task can't queue more in between.
+        kept = []
+        while not self.outbox.empty():
+            item = self.outbox.get_nowait()
+            if item[0] is not task:
+                kept.append(item)
+        for item in kept:
+            self.outbox.put_nowait(item)
+
+    def handle(self, payload: Dict[str, Any]) -> bool:
+        # Returns False when a control reply could not be queued
+        kind = payload.get("type", "chat")
+        if kind == "chat":
+            error = self.start_stream(payload)
+            if error:
+                return self.send_control(error)
+        elif kind == "cancel":
+            stream_id = str(payload.get("id") or "")
+            if self.cancel_stream(stream_id):
+                return self.send_control({"type": "cancelled", "id": stream_id})
+        elif kind == "ping":
+            return self.send_control({"type": "pong"})
+        elif kind != "pong":
+            return self.send_control({"type": "error", "detail": f"Unknown message type: {kind}"})
+        return True
+
+    async def serve(self):
+        sender = asyncio.create_task(self.sender())
+        receive = None
+        last_seen = time.monotonic()
+        close_code = None
+        try:
+            while True:
+                # Wait on the sender too, so a broken socket ends the
+                # connection now rather than at the next receive or heartbeat
+                if receive is None:
+                    receive = asyncio.ensure_future(self.websocket.receive_json())
+                done, _ = await asyncio.wait(
+                    {receive, sender}, timeout=WS_HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+                )
+                if sender in done:
+                    break
+                if receive not in done:
+                    # Quiet: ping so proxies keep the connection open. Clients
+                    # answer pings even mid-reply, so one that stays silent
+                    # this long has gone away or stopped reading.
+                    if time.monotonic() - last_seen > WS_IDLE_TIMEOUT:
+                        close_code = 1001
+                        break
+                    ok = self.send_control({"type": "ping"})
+                else:
+                    finished, receive = receive, None
+                    try:
+                        payload = finished.result()
+                    except (json.JSONDecodeError, KeyError):
+                        ok = self.send_control({"type": "error", "detail": "Messages must be JSON text frames."})
+                    else:
+                        last_seen = time.monotonic()
+                        if isinstance(payload, dict):
+                            ok = self.handle(payload)
+                        else:
+                            ok = self.send_control({"type": "error", "detail": "Messages must be JSON objects."})
+                if not ok:
+                    close_code = 1008
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if receive is not None:
+                receive.cancel()
+            for stream_id in list(self.streams):
+                self.cancel_stream(stream_id)
+            sender.cancel()
+            # Retrieve the sender's exception (e.g. a failed send_json) so it
+            # isn't reported as never retrieved; the connection is over anyway
+            await asyncio.gather(sender, return_exceptions=True)
+        if close_code is not None:
+            # The client may not be reading, so don't wait on the close handshake for long
+            try:
+                await asyncio.wait_for(self.websocket.close(code=close_code), timeout=WS_CLOSE_TIMEOUT)
+            except Exception:
+                pass
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Persistent alternative to POST /chat. Client messages:
+      {"type": "chat", "id": "<stream id>", "message": ..., "session_id": ..., "max_tokens": ...}
+      {"type": "cancel", "id": "<stream id>"}
+      {"type": "ping"} / {"type": "pong"}
+    Replies carry the same events as /chat plus the stream "id", then
+    "done", "error" or "cancelled". The server pings quiet connections and
+    closes ones that send nothing (not even a pong) for WS_IDLE_TIMEOUT.
+    """
+    # CORSMiddleware only covers HTTP; without this any page could use the API
+    # keys. Browsers always send Origin on a WebSocket handshake, so a missing
+    # one is a non-browser client, which POST /chat serves as well.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    await ChatConnection(websocket).serve()
+
 # --- Image generation endpoint ---
 def _extract_b64_from_provider_response(resp: Any) -> Optional[str]:
     """
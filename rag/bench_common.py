@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+# Helpers shared by benchmark.py, bench_index.py and bench_embeddings.py
+
+BENCH_QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_queries.json")
+WORKER_FLAG = "--worker"
+
+
+def load_queries(path=BENCH_QUERIES_PATH):
+    """Labelled queries: [{"query": ..., "relevant": [{"source", "section"}]}]."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def worker_args():
+    # argv after WORKER_FLAG when this process was started by run_worker_process
+    if len(sys.argv) > 1 and sys.argv[1] == WORKER_FLAG:
+        return sys.argv[2:]
+    return None
+
+
+def run_worker_process(script, *args):
+    """
+    Runs `script` in a fresh interpreter with WORKER_FLAG and `args`, so
+    import cost and memory belong to one run, and returns the JSON object
+    it prints last.
+    """
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(script), WORKER_FLAG, *map(str, args)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def print_table(rows, width=12):
+    columns = list(rows[0])
+    print("  ".join(f"{c:>{width}}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{str(row[c]):>{width}}" for c in columns))
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Like benchmark.py, run against the locally cached model unless told otherwise
+if "--online" not in sys.argv:
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np
+
+from bench_common import print_table, run_worker_process, worker_args
+from embeddings import EMBEDDING_BACKENDS, EMBEDDING_MODEL_NAME
+from onnx_embeddings import FP32_FILENAME, INT8_FILENAME, PARITY_MIN_COSINE, export_onnx_model, model_dir_for
+
+BENCH_QUERY = "Should I do a master's degree or take a job after my B.Tech?"
+
+
+def corpus_texts():
+    from chunker import chunk_documents
+    from loader import load_md_files
+    return [doc.page_content for doc in chunk_documents(load_md_files())]
+
+
+def run_worker(backend, texts_path, vectors_path, repeat):
+    # Runs in a fresh interpreter so import and load cost belong to one backend.
+    start = time.perf_counter()
+    from embeddings import load_embedding_model
+    model = load_embedding_model(backend)
+    model.embed_query("warm up")
+    load_s = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        model.embed_query(BENCH_QUERY)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    with open(texts_path, "r", encoding="utf-8") as f:
+        texts = json.load(f)
+    t = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    batch_s = time.perf_counter() - t
+    np.save(vectors_path, vectors)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": round(load_s, 3),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "query_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "chunks_per_s": round(len(texts) / batch_s, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against the torch reference.")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=50, help="single-query calls for latency")
+    parser.add_argument("--tolerance", type=float, default=PARITY_MIN_COSINE)
+    parser.add_argument("--check", action="store_true",
+                        help="exit non-zero if any backend falls below --tolerance")
+    parser.add_argument("--online", action="store_true", help="allow downloading the model")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    # Export once up front, so load_s measures the session and tokenizer load
+    # rather than a one-off torch import, export and quantization
+    model_dir = model_dir_for(EMBEDDING_MODEL_NAME)
+    if any(b.startswith("onnx") for b in backends) and not all(
+        os.path.exists(os.path.join(model_dir, name)) for name in (FP32_FILENAME, INT8_FILENAME)
+    ):
+        print(f"Exporting {EMBEDDING_MODEL_NAME} to ONNX...", file=sys.stderr)
+        export_onnx_model(EMBEDDING_MODEL_NAME)
+
+    texts = corpus_texts()
+    rows = []
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(texts, f)
+        for backend in backends:
+            vectors_path = os.path.join(tmp, f"{backend}.npy")
+            rows.append(run_worker_process(__file__, backend, texts_path, vectors_path, args.repeat))
+            vectors[backend] = np.load(vectors_path)
+
+    reference = vectors["torch"]
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    failed = []
+    for row in rows:
+        candidate = vectors[row["backend"]]
+        candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+        cosine = (reference * candidate).sum(axis=1)
+        row["min_cosine"] = round(float(cosine.min()), 5)
+        row["mean_cosine"] = round(float(cosine.mean()), 5)
+        if row["min_cosine"] < args.tolerance:
+            failed.append(row["backend"])
+
+    print(f"{len(texts)} chunks")
+    print_table(rows, width=13)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(texts), "tolerance": args.tolerance, "results": rows}, f, indent=2)
+
+    if failed:
+        print(f"Below tolerance {args.tolerance}: {', '.join(failed)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    worker = worker_args()
+    if worker:
+        backend, texts_path, vectors_path, repeat = worker
+        run_worker(backend, texts_path, vectors_path, int(repeat))
+    else:
+        main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench_common import BENCH_QUERIES_PATH, dir_size, load_queries, print_table, run_worker_process, worker_args
+
+def rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is a peak, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(backend, path, queries_path, k, repeat):
+    # Runs in a fresh interpreter so import cost and RSS belong to one backend.
+    rss_start = rss_mb()
+    start = time.perf_counter()
+    from vectordb import open_vectorstore
+    store = open_vectorstore(None, backend=backend, path=path)
+    open_s = time.perf_counter() - start
+    rss_open = rss_mb()
+
+    queries = np.load(queries_path)
+    results = []
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            t = time.perf_counter()
+            hits = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=k)
+            latencies.append((time.perf_counter() - t) * 1000)
+            if len(results) < len(queries):
+                results.append([doc.page_content for doc, _ in hits])
+
+    print(json.dumps({
+        "backend": backend,
+        "open_s": open_s,
+        "rss_start_mb": rss_start,
+        "rss_open_mb": rss_open,
+        "rss_end_mb": rss_mb(),
+        "latencies_ms": latencies,
+        "results": results,
+    }))
+
+
+def export_chroma():
+    from vectordb import open_vectorstore
+    data = open_vectorstore(None, backend="chroma").get(include=["embeddings", "documents", "metadatas"])
+    if not data["ids"]:
+        raise SystemExit("Chroma store is empty; run `python pipeline.py` first.")
+    return data
+
+
+def build_flat(data, path, backend):
+    from vectordb import open_vectorstore
+    store = open_vectorstore(None, backend=backend, path=path)
+    store.upsert(data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+    store.persist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Chroma store with the mmapped flat indexes.")
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50, help="passes over the query set for latency")
+    parser.add_argument("--queries", default=BENCH_QUERIES_PATH)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    from embeddings import get_embedding_model
+    from vectordb import CHROMA_PATH
+
+    data = export_chroma()
+    matrix = np.asarray(data["embeddings"], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    query_texts = [item["query"] for item in load_queries(args.queries)]
+    queries = np.asarray(get_embedding_model(cached=False).embed_documents(query_texts), dtype=np.float32)
+
+    # Ground truth: exact float32 cosine top-k
+    exact = np.argsort(-(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ matrix.T, axis=1)[:, :args.k]
+    truth = [{data["documents"][i] for i in row} for row in exact]
+
+    summary = []
+    with tempfile.TemporaryDirectory() as tmp:
+        queries_path = os.path.join(tmp, "queries.npy")
+        np.save(queries_path, queries)
+        paths = {"chroma": CHROMA_PATH}
+        for backend in ("flat", "flat-int8"):
+            paths[backend] = os.path.join(tmp, backend)
+            build_flat(data, paths[backend], backend)
+
+        for backend, path in paths.items():
+            run = run_worker_process(__file__, backend, path, queries_path, args.k, args.repeat)
+            latencies = np.asarray(run["latencies_ms"])
+            recall = np.mean([
+                len(truth[i] & set(found)) / args.k for i, found in enumerate(run["results"])
+            ])
+            summary.append({
+                "backend": backend,
+                "chunks": len(data["ids"]),
+                "open_s": round(run["open_s"], 4),
+                "rss_open_mb": round(run["rss_open_mb"], 1),
+                "rss_delta_mb": round(run["rss_end_mb"] - run["rss_start_mb"], 1),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+                f"recall@{args.k}": round(float(recall), 4),
+                "index_bytes": dir_size(path),
+            })
+
+    print_table(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    worker = worker_args()
+    if worker:
+        backend, path, queries_path, k, repeat = worker
+        run_worker(backend, path, queries_path, int(k), int(repeat))
+    else:
+        main()
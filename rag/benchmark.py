@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# The harness must run without network access, against the locally cached model
+if "--online" not in sys.argv:
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np
+
+from bench_common import BENCH_QUERIES_PATH, dir_size, load_queries, print_table
+from embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbeddings, EmbeddingCache
+from embeddings import DEFAULT_EMBEDDING_BACKEND, embedding_model_id, get_embedding_model
+from loader import list_md_files
+from pipeline import run_ingest
+from retriever import Retriever
+from vectordb import VECTOR_BACKENDS
+
+# A retrieved chunk is relevant to a label when it comes from the labelled
+# file and its heading path contains the labelled section. Labels name
+# sections rather than chunks so they stay valid across chunking settings.
+
+
+def matches(metadata, label):
+    return (
+        os.path.basename(str(metadata.get("source", ""))) == label["source"]
+        and label["section"].lower() in str(metadata.get("section", "")).lower()
+    )
+
+
+def score_query(results, labels, k):
+    top = results[:k]
+    found = sum(any(matches(metadata, label) for _, metadata, _ in top) for label in labels)
+    reciprocal_rank = 0.0
+    for rank, (_, metadata, _) in enumerate(top, start=1):
+        if any(matches(metadata, label) for label in labels):
+            reciprocal_rank = 1.0 / rank
+            break
+    return found / len(labels), reciprocal_rank
+
+
+def run_config(config, queries, k, repeat, model, embedding_backend, workdir, cache_dir=None):
+    """
+    `model` is an uncached embedding model, already loaded. Ingest goes
+    through an embedding cache in `cache_dir`, by default a new empty one
+    in `workdir` so every configuration pays for the same inference; search
+    uses `model` directly so latency includes embedding the query.
+    """
+    store_dir = os.path.join(workdir, "store")
+    corpus_bytes = sum(os.path.getsize(path) for path in list_md_files().values())
+    ingest_model = CachedEmbeddings(
+        lambda: model,
+        EmbeddingCache(
+            embedding_model_id(embedding_backend),
+            cache_dir=cache_dir or os.path.join(workdir, "embedding_cache"),
+        ),
+    )
+
+    start = time.perf_counter()
+    state = run_ingest(
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        backend=config["backend"],
+        store_dir=store_dir,
+        embedding_model=ingest_model,
+    )
+    ingest_s = time.perf_counter() - start
+    chunks = sum(len(entry["chunks"]) for entry in state.manifest["files"].values())
+
+    # cache_size=0 disables the retriever's LRU and the uncached model skips
+    # the on-disk embedding cache, so every search embeds its query
+    retriever = Retriever(
+        k=k,
+        cache_size=0,
+        backend=config["backend"],
+        mode=config["mode"],
+        path=store_dir,
+        embedding_model=model,
+    )
+    recalls = []
+    reciprocal_ranks = []
+    latencies = []
+    for _ in range(repeat):
+        for item in queries:
+            t = time.perf_counter()
+            results = retriever.search(item["query"], k=k)
+            latencies.append((time.perf_counter() - t) * 1000)
+            if len(recalls) < len(queries):
+                recall, reciprocal_rank = score_query(results, item["relevant"], k)
+                recalls.append(recall)
+                reciprocal_ranks.append(reciprocal_rank)
+
+    return {
+        **config,
+        "chunks": chunks,
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "ingest_s": round(ingest_s, 3),
+        "ingest_chunks_per_s": round(chunks / ingest_s, 1) if ingest_s else None,
+        "ingest_kb_per_s": round(corpus_bytes / 1024 / ingest_s, 1) if ingest_s else None,
+        "index_bytes": dir_size(store_dir),
+    }
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def str_list(value):
+    return value.split(",")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Retrieval quality and latency over rag_docs for a grid of configurations."
+    )
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--chunk-sizes", type=int_list, default=[100, 200, 400], help="tokens, comma separated")
+    parser.add_argument("--chunk-overlaps", type=int_list, default=[40])
+    parser.add_argument("--backends", type=str_list, default=list(VECTOR_BACKENDS))
+    parser.add_argument("--modes", type=str_list, default=["dense", "hybrid"])
+    parser.add_argument("--embedding-backends", type=str_list, default=[DEFAULT_EMBEDDING_BACKEND])
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the query set for latency")
+    parser.add_argument("--queries", default=BENCH_QUERIES_PATH)
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="ingest through the shared on-disk embedding cache instead of an empty "
+                             "one per configuration (measures cached re-ingest, not the model)")
+    parser.add_argument("--online", action="store_true", help="allow downloading the model")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Loaded and warmed once, outside every timed section
+        models = {}
+        for name in args.embedding_backends:
+            models[name] = get_embedding_model(cached=False, backend=name)
+            models[name].embed_query("warm up")
+
+        grid = itertools.product(
+            args.embedding_backends, args.chunk_sizes, args.chunk_overlaps, args.backends, args.modes
+        )
+        for n, (embedding_backend, chunk_size, chunk_overlap, backend, mode) in enumerate(grid):
+            model = models[embedding_backend]
+            if chunk_overlap >= chunk_size:
+                continue
+            config = {
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "backend": backend,
+                "mode": mode,
+                "embedding_model": embedding_model_id(embedding_backend),
+            }
+            print(f"Running {config}", file=sys.stderr)
+            workdir = os.path.join(tmp, f"config_{n}")
+            cache_dir = EMBEDDING_CACHE_PATH if args.warm_cache else None
+            results.append(run_config(
+                config, queries, args.k, args.repeat, model, embedding_backend, workdir, cache_dir
+            ))
+
+    print_table(results)
+
+    if args.output:
+        report = {
+            "meta": {
+                "k": args.k,
+                "queries": len(queries),
+                "repeat": args.repeat,
+                "warm_cache": args.warm_cache,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+BM25_FILENAME = "bm25.npz"
+K1 = 1.5
+B = 0.75
+
+# Keep "c++", "c#" and "b.tech"-style terms intact; split "ai/ml" into ai, ml.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*[+#]*")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from has have how i if in into is it its
+me my of on or our should so than that the their them then there these they this to was
+we were what when where which who why will with you your
+""".split())
+
+# On disk the index is a single compressed .npz of flat arrays:
+#
+#   ids       (n_docs,)      chunk id per row
+#   doc_lens  (n_docs,)      int32 token count per row
+#   terms     (n_terms,)     sorted vocabulary
+#   offsets   (n_terms + 1,) int64; postings of terms[t] are [offsets[t], offsets[t+1])
+#   postings  (n_postings,)  int32 doc row
+#   tfs       (n_postings,)  uint16 term frequency
+#
+# Lookups binary-search `terms` and score with vectorised numpy ops.
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path):
+        self.path = path
+        self._forward = None  # chunk id -> Counter(term -> tf) while mutating
+        self._load()
+
+    def _load(self):
+        self.ids = np.empty(0, dtype=str)
+        self.doc_lens = np.empty(0, dtype=np.int32)
+        self.terms = np.empty(0, dtype=str)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.empty(0, dtype=np.int32)
+        self.tfs = np.empty(0, dtype=np.uint16)
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            for name in ("ids", "doc_lens", "terms", "offsets", "postings", "tfs"):
+                setattr(self, name, data[name])
+
+    def __len__(self):
+        return len(self._forward) if self._forward is not None else len(self.ids)
+
+    def _mutable_forward(self):
+        if self._forward is None:
+            self._forward = {cid: Counter() for cid in self.ids.tolist()}
+            ids = self.ids.tolist()
+            for t, term in enumerate(self.terms.tolist()):
+                start, end = self.offsets[t], self.offsets[t + 1]
+                for row, tf in zip(self.postings[start:end].tolist(), self.tfs[start:end].tolist()):
+                    self._forward[ids[row]][term] = tf
+        return self._forward
+
+    def add(self, ids, texts):
+        if not ids:
+            return
+        forward = self._mutable_forward()
+        for cid, text in zip(ids, texts):
+            forward[cid] = Counter(tokenize(text))
+
+    def remove(self, ids):
+        if not ids:
+            return
+        forward = self._mutable_forward()
+        for cid in ids:
+            forward.pop(cid, None)
+
+    def clear(self):
+        self._forward = {}
+
+    def save(self):
+        if self._forward is None:
+            return
+        ids = list(self._forward)
+        inverted = {}
+        for row, cid in enumerate(ids):
+            for term, tf in self._forward[cid].items():
+                inverted.setdefault(term, []).append((row, tf))
+        terms = sorted(inverted)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(inverted[term]) for term in terms])
+        pairs = [pair for term in terms for pair in inverted[term]]
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            ids=np.asarray(ids, dtype=str),
+            doc_lens=np.asarray([sum(self._forward[cid].values()) for cid in ids], dtype=np.int32),
+            terms=np.asarray(terms, dtype=str),
+            offsets=offsets,
+            postings=np.asarray([row for row, _ in pairs], dtype=np.int32),
+            tfs=np.asarray([min(tf, 65535) for _, tf in pairs], dtype=np.uint16),
+        )
+        os.replace(tmp_path, self.path)
+        self._forward = None
+        self._load()
+
+    def search(self, query, k=10):
+        """
+        Returns up to k (chunk_id, bm25_score) pairs, best first. Searches the
+        last saved state.
+        """
+        n_docs = len(self.ids)
+        if not n_docs:
+            return []
+        avg_len = max(float(self.doc_lens.mean()), 1.0)
+        norm = K1 * (1 - B + B * self.doc_lens / avg_len)
+        scores = np.zeros(n_docs, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            t = np.searchsorted(self.terms, term)
+            if t >= len(self.terms) or self.terms[t] != term:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            rows = self.postings[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (K1 + 1) / (tf + norm[rows])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched])[:k]]
+        return [(str(self.ids[i]), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several best-first lists of keys: score(key) = sum 1 / (k + rank).
+    Returns [(key, score)] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
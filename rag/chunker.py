@@ -1,24 +1,143 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import re
+from array import array
 from loader import load_md_files
 
-def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""]
-    )
+# Bump when chunk metadata changes shape so ingest rewrites every chunk.
+# Ordinary edits to a file refresh the metadata of all of its chunks.
+CHUNK_FORMAT = 5
+
+# Sizes are in tokens. MiniLM truncates input at 256 word pieces and the
+# approximation below undercounts word pieces, so stay well under that.
+CHUNK_SIZE = 200
+CHUNK_OVERLAP = 40
+
+# Word-ish tokens and single punctuation marks, a close proxy for the
+# number of word pieces the embedding model will see.
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+NO_BREAK, LINE_BREAK, PARAGRAPH_BREAK = 0, 1, 2
+
+# Document metadata from the loader that chunks don't carry
+CHUNK_EXCLUDED_METADATA = frozenset(("sections", "mtime"))
+
+
+class ChunkRecord:
+    """
+    A chunk as a span of its source document: page_content[start:end].
+    Holds offsets rather than text so a corpus worth of chunks stays small.
+    """
+
+    __slots__ = ("doc_id", "start", "end", "heading_path", "index")
+
+    def __init__(self, doc_id, start, end, heading_path, index):
+        self.doc_id = doc_id
+        self.start = start
+        self.end = end
+        self.heading_path = heading_path
+        self.index = index
+
+    def __repr__(self):
+        return f"ChunkRecord({self.doc_id!r}, {self.start}, {self.end}, {self.heading_path!r}, {self.index})"
+
+    def text(self, doc):
+        return doc.page_content[self.start:self.end]
+
+    def metadata(self, doc):
+        # Chroma only stores scalar metadata, so the loader's outline stays
+        # behind. So does mtime: ingest tracks files by content hash, so a
+        # touched file is never rewritten and a stored copy would go stale.
+        metadata = {k: v for k, v in doc.metadata.items() if k not in CHUNK_EXCLUDED_METADATA}
+        metadata.update({
+            "chunk_index": self.index,
+            "section": self.heading_path,
+            "start": self.start,
+            "end": self.end,
+        })
+        return metadata
+
+    def to_document(self, doc):
+        return doc.__class__(page_content=self.text(doc), metadata=self.metadata(doc))
+
+
+def _section_spans(doc):
+    text = doc.page_content
+    sections = doc.metadata.get("sections") or []
+    spans = []
+    if not sections or sections[0][0] > 0:
+        spans.append((0, ""))
+    spans.extend((offset, heading_path) for offset, heading_path in sections)
+    for i, (start, heading_path) in enumerate(spans):
+        end = spans[i + 1][0] if i + 1 < len(spans) else len(text)
+        # A heading directly followed by a subheading has no body of its own;
+        # its title already appears in the subsections' heading paths.
+        lines = text[start:end].split("\n", 1)
+        if heading_path and (len(lines) < 2 or not lines[1].strip()):
+            continue
+        yield start, end, heading_path
+
+
+def _tokenize_span(text, start, end):
+    starts = array("l")
+    ends = array("l")
+    breaks = bytearray()  # breaks[i]: strongest break in the gap before token i
+    prev_end = start
+    for match in TOKEN_RE.finditer(text, start, end):
+        gap = text[prev_end:match.start()]
+        breaks.append(PARAGRAPH_BREAK if "\n\n" in gap else LINE_BREAK if "\n" in gap else NO_BREAK)
+        starts.append(match.start())
+        ends.append(match.end())
+        prev_end = match.end()
+    return starts, ends, breaks
+
+
+def _best_break(breaks, lo, hi):
+    # Latest paragraph break in (lo, hi], else latest line break, else hi
+    for level in (PARAGRAPH_BREAK, LINE_BREAK):
+        for i in range(hi, lo, -1):
+            if breaks[i] >= level:
+                return i
+    return hi
+
+
+def chunk_records(doc, doc_id=None, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Splits one markdown document into ChunkRecords. Chunks never cross a
+    heading, hold at most chunk_size tokens, prefer to end at a paragraph or
+    line break, and overlap their predecessor in the same section by up to
+    chunk_overlap tokens.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    doc_id = doc_id if doc_id is not None else doc.metadata.get("source")
+    text = doc.page_content
+    records = []
+    for section_start, section_end, heading_path in _section_spans(doc):
+        starts, ends, breaks = _tokenize_span(text, section_start, section_end)
+        n = len(starts)
+        i = 0
+        while i < n:
+            j = min(i + chunk_size, n)
+            if j < n:
+                j = _best_break(breaks, i + chunk_size // 2, j)
+            # The first chunk of a section starts at its heading line
+            start = section_start if i == 0 else starts[i]
+            records.append(ChunkRecord(doc_id, start, ends[j - 1], heading_path, len(records)))
+            if j >= n:
+                break
+            i = max(j - chunk_overlap, i + 1)
+    return records
+
+
+def chunk_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     chunked_docs = []
     for doc in documents:
-        chunks = text_splitter.split_text(doc.page_content)
-        for i, chunk in enumerate(chunks):
-            chunked_doc = doc.copy()
-            chunked_doc.page_content = chunk
-            chunked_doc.metadata["chunk_index"] = i
-            chunked_docs.append(chunked_doc)
+        for record in chunk_records(doc, chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+            chunked_docs.append(record.to_document(doc))
     return chunked_docs
 
-docs = load_md_files()
-chunked_docs = chunk_documents(docs)
-print(f"Total chunks created: {len(chunked_docs)}")
-print(chunked_docs[0].page_content)
-print(chunked_docs[0].metadata)
\ No newline at end of file
+if __name__ == "__main__":
+    docs = load_md_files()
+    chunked_docs = chunk_documents(docs)
+    print(f"Total chunks created: {len(chunked_docs)}")
+    print(chunked_docs[0].page_content)
+    print(chunked_docs[0].metadata)
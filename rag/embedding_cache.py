@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache")
+KEY_SIZE = 32  # sha256 digest
+
+# On-disk layout, one directory per embedding model:
+#
+#   embedding_cache/<model-slug>/meta.json    {"model_name": ..., "dim": 384}
+#   embedding_cache/<model-slug>/keys.bin     row i -> 32-byte sha256 of the chunk text
+#   embedding_cache/<model-slug>/vectors.f32  row i -> dim float32 values
+#
+# Both files are append-only and row-aligned. vectors.f32 is opened with
+# np.memmap, so a lookup returns a view into the page cache instead of a copy.
+
+
+def _slug(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_PATH):
+        self.model_name = model_name
+        self.dir = os.path.join(cache_dir, _slug(model_name))
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        # (index, matrix) swapped as one tuple so lock-free readers never pair
+        # a new index with an old matrix.
+        self._state = ({}, None)
+        self._keys_size = 0
+        self._keys_ino = None
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        with self._locked():
+            self._refresh()
+
+    @contextmanager
+    def _locked(self):
+        # Serialises writers across threads and, where flock exists, across the
+        # ingest CLI and app workers sharing the same cache directory.
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim is None:
+            return
+        row_bytes = 4 * self.dim
+        keys_stat = os.stat(self.keys_path) if os.path.exists(self.keys_path) else None
+        keys_size = keys_stat.st_size if keys_stat else 0
+        keys_ino = keys_stat.st_ino if keys_stat else None
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if (keys_size == self._keys_size and keys_ino == self._keys_ino
+                and vectors_size == keys_size // KEY_SIZE * row_bytes):
+            return
+
+        rows = min(keys_size // KEY_SIZE, vectors_size // row_bytes)
+        if keys_size != rows * KEY_SIZE or vectors_size != rows * row_bytes:
+            # A writer died mid-append (or left a partial row); drop the torn
+            # tail of either file so the next append starts row-aligned.
+            self._truncate(rows)
+        if keys_stat is None:
+            return
+
+        index = self._state[0]
+        if keys_ino != self._keys_ino or rows * KEY_SIZE < self._keys_size:
+            # The files were rewritten (compact), so every row number changed
+            index = {}
+            self._keys_size = 0
+
+        # Both files are append-only, so only the rows added since the last
+        # refresh need reading.
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_size)
+            keys = f.read(rows * KEY_SIZE - self._keys_size)
+        first_row = self._keys_size // KEY_SIZE
+        matrix = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+        # Publish the larger matrix before the new keys: a lock-free reader
+        # that sees a new key can then always find its row in self._state.
+        self._state = (index, matrix)
+        for i in range(len(keys) // KEY_SIZE):
+            index[keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = first_row + i
+        self._keys_size = rows * KEY_SIZE
+        self._keys_ino = keys_ino
+
+    def _truncate(self, rows):
+        for path, size in ((self.keys_path, rows * KEY_SIZE), (self.vectors_path, rows * 4 * self.dim)):
+            if os.path.exists(path):
+                os.truncate(path, size)
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def get_many(self, texts, refresh=True):
+        """
+        Returns one entry per text: a read-only float32 view into the cache,
+        or None on a miss. With refresh=False a miss does not take the lock
+        to look for rows appended by other processes.
+        """
+        keys = [text_key(text) for text in texts]
+        if refresh and any(key not in self._state[0] for key in keys):
+            # Another process may have appended since we last looked.
+            with self._locked():
+                self._refresh()
+        index, matrix = self._state
+        results = []
+        for key in keys:
+            row = index.get(key)
+            if row is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                if row >= len(matrix):
+                    # The key was added by a refresh after we took our snapshot
+                    matrix = self._state[1]
+                self.hits += 1
+                results.append(matrix[row])
+        return results
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+            self._refresh()
+
+            index = self._state[0]
+            new_keys = {}
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key not in index:
+                    new_keys.setdefault(key, vector)
+            if not new_keys:
+                return
+
+            # Vectors first: a crash between the two writes leaves an orphan
+            # vector that _refresh trims, never a key without its vector.
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(new_keys.values())).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            self._refresh()
+
+    def compact(self, live_texts):
+        """
+        Rewrite the cache keeping only vectors for `live_texts`, e.g. the
+        chunks currently in the vector store. Run it while no other process
+        is using the cache, since row numbers change.
+        """
+        live_keys = {text_key(text) for text in live_texts}
+        with self._locked():
+            self._refresh()
+            index, matrix = self._state
+            keep = [(key, row) for key, row in index.items() if key in live_keys]
+            keep.sort(key=lambda item: item[1])
+            removed = len(index) - len(keep)
+            if not removed:
+                return 0
+
+            matrix = (
+                np.ascontiguousarray(matrix[[row for _, row in keep]])
+                if keep else np.empty((0, self.dim), dtype=np.float32)
+            )
+            with open(self.vectors_path + ".tmp", "wb") as f:
+                f.write(matrix.tobytes())
+            with open(self.keys_path + ".tmp", "wb") as f:
+                f.write(b"".join(key for key, _ in keep))
+            os.replace(self.vectors_path + ".tmp", self.vectors_path)
+            os.replace(self.keys_path + ".tmp", self.keys_path)
+
+            self._state = ({}, None)
+            self._keys_size = 0
+            self._refresh()
+            return removed
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def size_bytes(self):
+        return sum(
+            os.path.getsize(path)
+            for path in (self.keys_path, self.vectors_path)
+            if os.path.exists(path)
+        )
+
+    def report(self):
+        return (
+            f"Embedding cache: {len(self)} vectors, {self.size_bytes() / 1024:.1f} KiB, "
+            f"{self.hits} hits / {self.misses} misses ({self.hit_rate:.1%} hit rate)"
+        )
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings that consults an EmbeddingCache before the wrapped
+    model. The model itself is only built on the first cache miss, so an
+    ingest over an unchanged corpus never loads it.
+    """
+
+    def __init__(self, model_factory, cache):
+        self.model_factory = model_factory
+        self.cache = cache
+        self.model_name = cache.model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self.model_factory()
+        return self._model
+
+    def embed_documents(self, texts):
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.model.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in cached]
+
+    def embed_query(self, text):
+        # Queries are read from the cache but never written to it: every
+        # distinct user query would otherwise grow the ingest cache for good.
+        # Callers that repeat queries keep their own in-memory cache
+        # (see Retriever).
+        vector = self.cache.get_many([text], refresh=False)[0]
+        if vector is None:
+            vector = self.model.embed_query(text)
+        return np.asarray(vector, dtype=np.float32).tolist()
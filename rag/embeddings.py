@@ -1,19 +1,57 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
 from loader import load_md_files
 from chunker import chunk_documents
+from embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbeddings, EmbeddingCache
 
-# Load and chunk documents
-docs = load_md_files()
-chunked_docs = chunk_documents(docs)
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-def get_embeddings(chunked_docs):
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+# "torch" runs sentence-transformers in full precision; "onnx-int8" and
+# "onnx-fp32" run an exported graph on onnxruntime (see onnx_embeddings.py)
+EMBEDDING_BACKENDS = ("torch", "onnx-int8", "onnx-fp32")
+DEFAULT_EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+def embedding_model_id(backend=None):
+    # Vectors from different backends are close but not identical, so each
+    # gets its own cache and store manifest entry
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {EMBEDDING_BACKENDS})")
+    return EMBEDDING_MODEL_NAME if backend == "torch" else f"{EMBEDDING_MODEL_NAME}@{backend}"
+
+def load_embedding_model(backend=None):
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    embedding_model_id(backend)
+    if backend == "torch":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    from onnx_embeddings import INT8_FILENAME, OnnxEmbeddings, export_onnx_model, model_dir_for
+    if not os.path.exists(os.path.join(model_dir_for(EMBEDDING_MODEL_NAME), INT8_FILENAME)):
+        print(f"Exporting {EMBEDDING_MODEL_NAME} to ONNX (one-off)...")
+        export_onnx_model(EMBEDDING_MODEL_NAME)
+    return OnnxEmbeddings(EMBEDDING_MODEL_NAME, quantized=(backend == "onnx-int8"))
+
+def get_embedding_model(cached=True, cache_dir=None, backend=None):
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    if not cached:
+        return load_embedding_model(backend)
+    # Shared by ingest and query-time embedding; the model is only loaded on a cache miss
+    return CachedEmbeddings(
+        lambda: load_embedding_model(backend),
+        EmbeddingCache(embedding_model_id(backend), cache_dir=cache_dir or EMBEDDING_CACHE_PATH)
     )
-    
+
+def get_embeddings(chunked_docs, embedding_model=None):
+    if embedding_model is None:
+        embedding_model = get_embedding_model()
+
+    # One batched call instead of a forward pass per chunk
+    embeddings = embedding_model.embed_documents(
+        [doc.page_content for doc in chunked_docs]
+    )
+
     embedded_docs = []
-    for doc in chunked_docs:
-        embedding = embedding_model.embed_query(doc.page_content)
+    for doc, embedding in zip(chunked_docs, embeddings):
         embedded_docs.append({
             "content": doc.page_content,
             "metadata": doc.metadata,
@@ -21,6 +59,10 @@ def get_embeddings(chunked_docs):
         })
     return embedded_docs, embedding_model
 
-embedded_docs, embedding_model = get_embeddings(chunked_docs)
-print(f"Total embeddings created: {len(embedded_docs)}")
-print(f"Embedding vector size: {len(embedded_docs[0]['embedding'])}")
+if __name__ == "__main__":
+    # Load and chunk documents
+    docs = load_md_files()
+    chunked_docs = chunk_documents(docs)
+    embedded_docs, embedding_model = get_embeddings(chunked_docs)
+    print(f"Total embeddings created: {len(embedded_docs)}")
+    print(f"Embedding vector size: {len(embedded_docs[0]['embedding'])}")
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+SEARCH_BLOCK_ROWS = 4096
+# persist() swaps its files one at a time; a reader that lands between two
+# swaps sees mismatched files and retries
+LOAD_RETRIES = 20
+LOAD_RETRY_DELAY = 0.05
+
+# A brute-force cosine index for corpora small enough that HNSW buys nothing.
+#
+#   <path>/vectors.npy  (n, dim) L2-normalised rows: float32, or int8 when quantized
+#   <path>/scales.npy   (n,) float32 per-row dequantisation scale (int8 only)
+#   <path>/docs.json    {"dtype": ..., "rows": n, "ids": [...], "documents": [...], "metadatas": [...]}
+#
+# Readers open vectors.npy with mmap_mode="r", so every worker process shares
+# the same page-cache copy. persist() writes new files and swaps them in with
+# os.replace, which leaves existing mappings valid.
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize_int8(vectors):
+    # Symmetric per-row quantisation: row ~= q * scale, q in [-127, 127]
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    q = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return q, scales
+
+
+class FlatIndex:
+    """
+    Memory-mapped exact cosine top-k over a float32 or int8 matrix. Exposes
+    the subset of the Chroma vector store API that the rag package uses.
+    """
+
+    def __init__(self, path, quantize=False, embedding_function=None):
+        self.path = path
+        self.dtype = "int8" if quantize else "float32"
+        self.embedding_function = embedding_function
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.scales_path = os.path.join(path, "scales.npy")
+        self.docs_path = os.path.join(path, "docs.json")
+        self._records = None  # id -> (vector, document, metadata) while mutating
+        self._load()
+
+    def _load(self):
+        for _ in range(LOAD_RETRIES):
+            if self._try_load():
+                return
+            time.sleep(LOAD_RETRY_DELAY)
+        raise RuntimeError(f"Flat index at {self.path} is inconsistent: row counts of its files differ")
+
+    def _try_load(self):
+        """
+        Loads the persisted files. Returns False when they don't belong
+        together, i.e. a persist() is midway through swapping them in.
+        """
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.vectors = None
+        self.scales = None
+        if not os.path.exists(self.docs_path):
+            return True
+        with open(self.docs_path, "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        if docs["dtype"] != self.dtype or not docs["ids"]:
+            # Written with the other precision: treat as empty and let ingest rebuild
+            return True
+        rows = docs.get("rows", len(docs["ids"]))
+        vectors = np.load(self.vectors_path, mmap_mode="r")
+        scales = np.load(self.scales_path, mmap_mode="r") if self.dtype == "int8" else None
+        if len(docs["ids"]) != rows or vectors.shape[0] != rows or (scales is not None and scales.shape[0] != rows):
+            return False
+        self.ids = docs["ids"]
+        self.documents = docs["documents"]
+        self.metadatas = docs["metadatas"]
+        self.vectors = vectors
+        self.scales = scales
+        return True
+
+    def __len__(self):
+        return len(self._records) if self._records is not None else len(self.ids)
+
+    def _float_rows(self, rows=slice(None)):
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[rows][:, None]
+        return block
+
+    def _mutable_records(self):
+        if self._records is None:
+            vectors = self._float_rows() if self.vectors is not None else []
+            self._records = {
+                cid: (vector, document, metadata)
+                for cid, vector, document, metadata in zip(self.ids, vectors, self.documents, self.metadatas)
+            }
+        return self._records
+
+    # --- Chroma-compatible API -------------------------------------------
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        records = self._mutable_records()
+        for cid, vector, document, metadata in zip(ids, _normalize(embeddings), documents, metadatas):
+            records[cid] = (vector, document, metadata)
+
+    def update(self, ids, metadatas):
+        # Metadata-only update of existing rows; unknown ids are skipped
+        records = self._mutable_records()
+        for cid, metadata in zip(ids, metadatas):
+            if cid in records:
+                vector, document, _ = records[cid]
+                records[cid] = (vector, document, metadata)
+
+    def delete(self, ids=None):
+        records = self._mutable_records()
+        for cid in ids or []:
+            records.pop(cid, None)
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        if self._records is not None:
+            all_ids = list(self._records)
+            documents = [record[1] for record in self._records.values()]
+            metadatas = [record[2] for record in self._records.values()]
+        else:
+            all_ids, documents, metadatas = self.ids, self.documents, self.metadatas
+        if ids is not None:
+            rows = {cid: i for i, cid in enumerate(all_ids)}
+            keep = [rows[cid] for cid in ids if cid in rows]
+            all_ids = [all_ids[i] for i in keep]
+            documents = [documents[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+        result = {"ids": list(all_ids)}
+        if "documents" in include:
+            result["documents"] = list(documents)
+        if "metadatas" in include:
+            result["metadatas"] = list(metadatas)
+        return result
+
+    def persist(self):
+        if self._records is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        ids = list(self._records)
+        documents = [record[1] for record in self._records.values()]
+        metadatas = [record[2] for record in self._records.values()]
+        vectors = (
+            np.stack([record[0] for record in self._records.values()])
+            if ids else np.empty((0, 0), dtype=np.float32)
+        )
+
+        # Note: np.save appends ".npy" to names that lack it, so keep the suffix last.
+        if self.dtype == "int8":
+            vectors, scales = quantize_int8(vectors) if ids else (vectors.astype(np.int8), np.empty(0, np.float32))
+            np.save(self.scales_path + ".tmp.npy", scales)
+        np.save(self.vectors_path + ".tmp.npy", vectors)
+        with open(self.docs_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "dtype": self.dtype,
+                "rows": len(ids),
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+            }, f)
+
+        if self.dtype == "int8":
+            os.replace(self.scales_path + ".tmp.npy", self.scales_path)
+        os.replace(self.vectors_path + ".tmp.npy", self.vectors_path)
+        os.replace(self.docs_path + ".tmp", self.docs_path)
+        self._records = None
+        self._load()
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        """
+        Returns [(Document, distance)] best first, where distance is cosine
+        distance (1 - cosine similarity), so lower is better as with Chroma.
+        Searches the last persisted state.
+        """
+        n = len(self.ids)
+        if not n:
+            return []
+        k = min(k, n)
+        query = _normalize(embedding)
+
+        # Score in blocks so an int8 index never materialises a full float32 copy
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            rows = slice(start, min(start + SEARCH_BLOCK_ROWS, n))
+            scores[rows] = self._float_rows(rows) @ query
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self.documents[i], metadata=self.metadatas[i]), float(1.0 - scores[i]))
+            for i in top
+        ]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self.embedding_function.embed_query(query), k=k
+        )
@@ -1,24 +1,93 @@
 import os
-from langchain_community.document_loaders import UnstructuredMarkdownLoader
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-RAG_DOCS_PATH = "rag_docs"
+from langchain_core.documents import Document
+
+# Resolved against this file so ingest works from any working directory
+RAG_DOCS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_docs")
+
+# Below this many files a process pool costs more to start than it saves
+PARALLEL_MIN_FILES = 8
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE_RE = re.compile(r"^[ \t]*(```|~~~)")
+
+def list_md_files():
+    return {
+        filename: os.path.join(RAG_DOCS_PATH, filename)
+        for filename in sorted(os.listdir(RAG_DOCS_PATH))
+        if filename.endswith(".md")
+    }
+
+def parse_sections(text):
+    """
+    Returns [(offset, heading_path)] for every ATX heading outside fenced code,
+    where heading_path joins the enclosing headings with " > ".
+    """
+    sections = []
+    stack = []
+    in_fence = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = HEADING_RE.match(line.rstrip("\r\n"))
+            if match:
+                level = len(match.group(1))
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, match.group(2).strip()))
+                sections.append((offset, " > ".join(title for _, title in stack)))
+        offset += len(line)
+    return sections
+
+def load_md_file(file_path):
+    # Markdown is kept verbatim (headings included); the heading outline goes
+    # in metadata["sections"] for the chunker to resolve per chunk.
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return [Document(
+        page_content=text,
+        metadata={
+            "source": os.path.basename(file_path),
+            "doc_type": "markdown",
+            "mtime": os.path.getmtime(file_path),
+            "sections": parse_sections(text),
+        }
+    )]
+
+def iter_md_files(file_paths, max_workers=None):
+    """
+    Lazily yields load_md_file(path) for each path, in order. Large batches are
+    parsed on a process pool with a bounded number of files in flight.
+    """
+    file_paths = list(file_paths)
+    if len(file_paths) < PARALLEL_MIN_FILES:
+        for file_path in file_paths:
+            yield load_md_file(file_path)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for file_path in file_paths:
+            pending.append(pool.submit(load_md_file, file_path))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 def load_md_files():
     documents = []
-    for filename in os.listdir(RAG_DOCS_PATH):
-        if filename.endswith(".md"):
-            file_path = os.path.join(RAG_DOCS_PATH, filename)
-            loader = UnstructuredMarkdownLoader(
-                file_path,
-                meta_data = {
-                    "source": filename,
-                    "doc_type": "markdown"
-                })
-            docs = loader.load()
-            documents.extend(docs)
+    for docs in iter_md_files(list_md_files().values()):
+        documents.extend(docs)
     return documents
 
-docs = load_md_files()
-print(f"Total documents loaded: {len(docs)}")
-print(docs[0].page_content[:300])
-print(docs[0].metadata)
\ No newline at end of file
+if __name__ == "__main__":
+    docs = load_md_files()
+    print(f"Total documents loaded: {len(docs)}")
+    print(docs[0].page_content[:300])
+    print(docs[0].metadata)
@@ -1,20 +1,12 @@
-from loader import load_md_files
-from chunker import chunk_documents
-from embeddings import get_embeddings
-from vectordb import create_vectorstore
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE
+from pipeline import print_report, run_ingest
 
 
-def ingest():
-    docs = load_md_files()
-    chunked_docs = chunk_documents(docs)
-    embedded_docs, embedding_model = get_embeddings(chunked_docs)
-    vectorstore = create_vectorstore(
-        embedded_docs,
-        embedding_model=embedding_model
-    )
-    print("Ingestion complete.")
-    print(f"Ingested {len(embedded_docs)} chunks into ChromaDB")
+def ingest(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    state = run_ingest(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    print_report(state)
+    return state
 
 
 if __name__ == "__main__":
-    ingest()
\ No newline at end of file
+    ingest()
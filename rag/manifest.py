@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+# The manifest records, per source file, the hash of the raw file bytes and the
+# ids of the chunks it produced, plus the settings those chunks were built with:
+#
+#   {"version": 1,
+#    "settings": {"chunk_size": 1000, "chunk_overlap": 200, "embedding_model": "..."},
+#    "files": {"career_decision_framework.md": {"hash": "...", "chunks": ["...", ...]}}}
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(file_path):
+    with open(file_path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def chunk_id(source, text):
+    # Deterministic: the same chunk text from the same file always maps to the
+    # same id, so re-ingesting it is an upsert rather than a duplicate.
+    return hash_text(f"{source}\x00{text}")[:32]
+
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "settings": None, "files": {}}
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    # Atomic swap so an interrupted ingest never leaves a half-written manifest.
+    os.replace(tmp_path, manifest_path)
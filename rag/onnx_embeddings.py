@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+FP32_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+MAX_LENGTH = 256  # all-MiniLM-L6-v2 max_seq_length
+BATCH_SIZE = 32
+
+# Minimum cosine similarity to the sentence-transformers vector for the same
+# text. Quantization noise moves vectors slightly; a broken export, tokenizer
+# or pooling mismatch moves them far more.
+PARITY_MIN_COSINE = 0.98
+
+# Serving only needs onnxruntime and the Rust `tokenizers` package; torch and
+# transformers are needed once, by export_onnx_model, to produce the graph.
+
+
+def model_dir_for(model_name, models_path=ONNX_MODELS_PATH):
+    return os.path.join(models_path, model_name.replace("/", "__"))
+
+
+def export_onnx_model(model_name, output_dir=None, quantize=True):
+    """
+    Exports a sentence-transformers checkpoint to ONNX (last_hidden_state
+    output, dynamic batch and sequence axes), saves its fast tokenizer, and
+    writes an int8 dynamically quantized copy. Returns the output directory.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = output_dir or model_dir_for(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    fp32_path = os.path.join(output_dir, FP32_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILENAME), weight_type=QuantType.QInt8)
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported ONNX graph: fast tokenizer, mean
+    pooling over the attention mask, then L2 normalisation, matching the
+    all-MiniLM-L6-v2 sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_name, model_dir=None, quantized=True, batch_size=BATCH_SIZE, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = model_dir or model_dir_for(model_name)
+        self.model_name = f"{model_name}@onnx-{'int8' if quantized else 'fp32'}"
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, INT8_FILENAME if quantized else FP32_FILENAME),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_array(self, texts):
+        # Batch texts of similar length together to keep padding low
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            vectors = self._embed_batch([texts[i] for i in rows])
+            if not out.shape[1]:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+        return out
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
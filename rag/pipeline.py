@@ -0,0 +1,355 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from bm25_index import BM25_FILENAME, BM25Index
+from loader import iter_md_files, list_md_files
+from chunker import CHUNK_FORMAT, CHUNK_OVERLAP, CHUNK_SIZE, chunk_records
+from embeddings import DEFAULT_EMBEDDING_BACKEND, EMBEDDING_BACKENDS, get_embedding_model, get_embeddings
+from manifest import (
+    MANIFEST_FILENAME,
+    chunk_id,
+    hash_file,
+    load_manifest,
+    new_manifest,
+    save_manifest,
+)
+from vectordb import (
+    DEFAULT_VECTOR_BACKEND,
+    VECTOR_BACKENDS,
+    clear_vectorstore,
+    delete_chunks,
+    open_vectorstore,
+    store_path,
+    update_chunk_metadata,
+    upsert_chunks,
+)
+
+QUEUE_SIZE = 64
+POLL_INTERVAL = 0.1  # seconds a blocked stage waits before checking for a stop
+EMBED_BATCH_SIZE = 32
+
+# Ingest runs as a chain of generators:
+#
+#   load (file -> docs) -> chunk (docs -> new chunks) -> embed (batches) -> write
+#
+# The write stage updates the vector store and the BM25 index with the same
+# chunk ids, so the two never drift apart.
+#
+# Each stage runs on its own thread and hands items downstream through a
+# bounded queue, so loading the next file overlaps with embedding the current
+# batch while at most QUEUE_SIZE items per stage are ever held in memory.
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.items = 0
+
+    @contextmanager
+    def timed(self, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy += time.perf_counter() - start
+            self.items += items
+
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def threaded(generator, maxsize=QUEUE_SIZE, stop=None):
+    """
+    Run `generator` on a background thread and iterate its items through a
+    bounded queue. The producer blocks when the consumer falls behind.
+    Exceptions raised in the stage are re-raised in the consumer.
+
+    `stop` is shared by every stage of a pipeline. It is set when any
+    consumer fails or is closed early; every producer then closes its
+    generator and exits instead of waiting on a queue nobody reads. Errors
+    already on their way downstream are still delivered.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = stop or threading.Event()
+    consumer_gone = threading.Event()
+
+    def _put(item, error=False):
+        while not consumer_gone.is_set() and (error or not stop.is_set()):
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for item in generator:
+                if not _put(item):
+                    return
+            _put(_DONE)
+        except BaseException as e:
+            _put(_StageError(e), error=True)
+        finally:
+            close = getattr(generator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    finished = False
+    try:
+        while True:
+            try:
+                item = q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not producer.is_alive() and q.empty():
+                    return  # the producer was stopped
+                continue
+            if item is _DONE:
+                finished = True
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        consumer_gone.set()
+        if not finished:
+            stop.set()
+
+
+class IngestState:
+    def __init__(self, manifest, settings, backend):
+        self.manifest = manifest
+        self.backend = backend
+        self.bm25 = None
+        self.embedding_cache = None
+        self.settings = settings
+        self.rechunk = manifest["settings"] != settings
+        self.stale_ids = []
+        # Chunks of changed files whose text (and so id) survived, with their
+        # metadata recomputed against the new version of the file
+        self.retagged = {}
+        self.unchanged_files = 0
+        self.total_files = 0
+        self.elapsed = 0.0
+        self.stats = {
+            name: StageStats(name) for name in ("load", "chunk", "embed", "write")
+        }
+
+
+def load_stage(state, files):
+    stats = state.stats["load"]
+    changed = []
+    with stats.timed(0):
+        # Hashing raw bytes is cheap; only changed files get parsed
+        for source, file_path in files.items():
+            file_hash = hash_file(file_path)
+            entry = state.manifest["files"].get(source)
+            if entry and entry["hash"] == file_hash and not state.rechunk:
+                state.unchanged_files += 1
+            else:
+                changed.append((source, file_path, file_hash, entry))
+
+    parsed = iter_md_files([file_path for _, file_path, _, _ in changed])
+    try:
+        for source, _, file_hash, entry in changed:
+            with stats.timed(1):
+                docs = next(parsed)
+            yield source, file_hash, entry, docs
+    finally:
+        # Shuts the process pool down when ingest stops early
+        parsed.close()
+
+
+def chunk_stage(state, loaded):
+    stats = state.stats["chunk"]
+    settings = state.settings
+    for source, file_hash, entry, docs in loaded:
+        with stats.timed(0):
+            old_ids = set(entry["chunks"]) if entry else set()
+            ids = []
+            seen = set()
+            fresh = []
+            for doc in docs:
+                records = chunk_records(
+                    doc,
+                    doc_id=source,
+                    chunk_size=settings["chunk_size"],
+                    chunk_overlap=settings["chunk_overlap"]
+                )
+                for record in records:
+                    cid = chunk_id(source, record.text(doc))
+                    if cid in seen:
+                        continue
+                    seen.add(cid)
+                    ids.append(cid)
+                    if cid not in old_ids:
+                        # Offsets plus a shared reference to the source doc; the
+                        # chunk text is only materialised when its batch is embedded
+                        fresh.append((cid, record, doc))
+                    else:
+                        # Same text, but its offsets, index and section may have
+                        # moved; refresh the stored metadata without re-embedding
+                        state.retagged[cid] = record.metadata(doc)
+            state.stale_ids.extend(old_ids - seen)
+            state.manifest["files"][source] = {"hash": file_hash, "chunks": ids}
+            stats.items += len(fresh)
+        yield from fresh
+
+
+def embed_stage(state, chunks, embedding_model, batch_size=EMBED_BATCH_SIZE):
+    stats = state.stats["embed"]
+
+    def _embed(batch):
+        ids = [cid for cid, _, _ in batch]
+        with stats.timed(len(batch)):
+            embedded_docs, _ = get_embeddings(
+                [record.to_document(doc) for _, record, doc in batch],
+                embedding_model
+            )
+        return ids, embedded_docs
+
+    batch = []
+    for item in chunks:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield _embed(batch)
+            batch = []
+    if batch:
+        yield _embed(batch)
+
+
+def write_stage(state, batches, vectorstore):
+    stats = state.stats["write"]
+    for ids, embedded_docs in batches:
+        with stats.timed(len(ids)):
+            upsert_chunks(vectorstore, ids, embedded_docs)
+            state.bm25.add(ids, [doc["content"] for doc in embedded_docs])
+    # Upstream is exhausted here, so every stale and surviving id has been collected.
+    with stats.timed(len(state.retagged)):
+        update_chunk_metadata(vectorstore, list(state.retagged), list(state.retagged.values()))
+        delete_chunks(vectorstore, state.stale_ids)
+        if state.stale_ids:
+            state.bm25.remove(state.stale_ids)
+        vectorstore.persist()
+        # A no-op unless add, remove, clear or the backfill touched the index,
+        # so an unchanged corpus doesn't rewrite bm25.npz
+        state.bm25.save()
+
+
+def run_ingest(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, batch_size=EMBED_BATCH_SIZE, queue_size=QUEUE_SIZE,
+               compact_cache=False, backend=None, store_dir=None, embedding_model=None,
+               embedding_backend=None):
+    # Each backend keeps its own manifest next to its data, so switching
+    # backends never mistakes one store's contents for another's.
+    backend = backend or DEFAULT_VECTOR_BACKEND
+    store_dir = store_dir or store_path(backend)
+    manifest_path = os.path.join(store_dir, MANIFEST_FILENAME)
+    bm25 = BM25Index(os.path.join(store_dir, BM25_FILENAME))
+    embedding_model = embedding_model or get_embedding_model(backend=embedding_backend)
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_format": CHUNK_FORMAT,
+        "embedding_model": embedding_model.model_name,
+    }
+    vectorstore = open_vectorstore(embedding_model, backend=backend, path=store_dir)
+
+    manifest = load_manifest(manifest_path)
+    if (manifest is None
+            or manifest["settings"]["embedding_model"] != settings["embedding_model"]
+            or manifest["settings"].get("chunk_format") != CHUNK_FORMAT):
+        # Without a manifest we can't tell which stored chunks are ours (older
+        # ingests used random ids), vectors from another model can't be reused,
+        # and a new chunk format changes metadata on chunks whose text (and so
+        # id) is unchanged. Re-embedding after a reset is served by the cache.
+        clear_vectorstore(vectorstore)
+        bm25.clear()
+        manifest = new_manifest()
+    elif not os.path.exists(bm25.path):
+        # Store predates the BM25 index: backfill it once from the stored chunks
+        stored = vectorstore.get(include=["documents"])
+        bm25.add(stored["ids"], stored["documents"])
+    # Changed chunking settings force a re-chunk, but chunks whose text survives
+    # keep their id and are not embedded again.
+    state = IngestState(manifest, settings, backend)
+    state.embedding_cache = getattr(embedding_model, "cache", None)
+    state.bm25 = bm25
+
+    files = list_md_files()
+    state.total_files = len(files)
+    for source in sorted(set(manifest["files"]) - set(files)):
+        state.stale_ids.extend(manifest["files"].pop(source)["chunks"])
+
+    start = time.perf_counter()
+    stop = threading.Event()
+    loaded = threaded(load_stage(state, files), queue_size, stop)
+    chunks = threaded(chunk_stage(state, loaded), queue_size, stop)
+    batches = threaded(embed_stage(state, chunks, embedding_model, batch_size), queue_size, stop)
+    try:
+        write_stage(state, batches, vectorstore)
+    finally:
+        # A failed write tears the upstream stages down; after a clean run
+        # they have all finished already.
+        stop.set()
+    state.elapsed = time.perf_counter() - start
+
+    # Only record the new state once the store reflects it; re-running after a
+    # crash just upserts the same deterministic ids again.
+    manifest["settings"] = settings
+    save_manifest(manifest, manifest_path)
+
+    if compact_cache and state.embedding_cache is not None:
+        # Drop cached vectors for chunks that no longer exist in the store
+        live_texts = vectorstore.get(include=["documents"])["documents"]
+        removed = state.embedding_cache.compact(live_texts)
+        print(f"Compacted embedding cache: removed {removed} vectors")
+    return state
+
+
+def print_report(state):
+    total_chunks = sum(len(entry["chunks"]) for entry in state.manifest["files"].values())
+    print("Ingestion complete.")
+    print(f"Files: {state.total_files} ({state.unchanged_files} unchanged)")
+    print(f"Embedded {state.stats['embed'].items} new chunks, updated {len(state.retagged)}, "
+          f"removed {len(state.stale_ids)} stale chunks")
+    print(f"{total_chunks} chunks in the {state.backend} store")
+    print(f"{'stage':<8}{'items':>8}{'busy (s)':>12}")
+    for stats in state.stats.values():
+        print(f"{stats.name:<8}{stats.items:>8}{stats.busy:>12.3f}")
+    print(f"{'wall':<8}{'':>8}{state.elapsed:>12.3f}")
+    if state.embedding_cache is not None:
+        print(state.embedding_cache.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest rag_docs into the vector store.")
+    parser.add_argument("--backend", choices=VECTOR_BACKENDS, default=DEFAULT_VECTOR_BACKEND)
+    parser.add_argument("--embedding-backend", choices=EMBEDDING_BACKENDS, default=DEFAULT_EMBEDDING_BACKEND)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="tokens per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="tokens shared with the previous chunk")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--compact-cache", action="store_true",
+                        help="drop cached embeddings of chunks no longer in the store")
+    args = parser.parse_args()
+
+    print_report(run_ingest(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        compact_cache=args.compact_cache,
+        backend=args.backend,
+        embedding_backend=args.embedding_backend,
+    ))
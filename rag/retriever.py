@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from bm25_index import BM25_FILENAME, BM25Index, reciprocal_rank_fusion
+from embeddings import get_embedding_model
+from manifest import chunk_id
+from vectordb import open_vectorstore, store_path
+
+DEFAULT_TOP_K = 4
+DEFAULT_CACHE_SIZE = 256
+# Candidates taken from each of the dense and BM25 rankings before fusion
+HYBRID_CANDIDATES = 20
+RETRIEVAL_MODES = ("hybrid", "dense")
+DEFAULT_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+
+
+class LRUCache:
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+def _result_id(content, metadata):
+    # Same id the ingest pipeline stored the chunk under
+    return chunk_id(os.path.basename(str(metadata.get("source", ""))), content)
+
+
+class Retriever:
+    """
+    Long-lived handle on the embedding model and vector store. Build it once
+    per process (e.g. in the app lifespan) and call `search` from a worker
+    thread; it blocks on embedding and the index lookup.
+    """
+
+    def __init__(self, k=DEFAULT_TOP_K, cache_size=DEFAULT_CACHE_SIZE, backend=None, mode=None,
+                 path=None, embedding_model=None):
+        self.k = k
+        self.mode = mode or DEFAULT_RETRIEVAL_MODE
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {self.mode} (expected one of {RETRIEVAL_MODES})")
+        self.embedding_model = embedding_model or get_embedding_model()
+        self.vectorstore = open_vectorstore(self.embedding_model, backend=backend, path=path)
+        self.bm25 = None
+        bm25_path = os.path.join(path or store_path(backend), BM25_FILENAME)
+        if self.mode == "hybrid" and os.path.exists(bm25_path):
+            self.bm25 = BM25Index(bm25_path)
+        self._embedding_cache = LRUCache(cache_size)
+        self._result_cache = LRUCache(cache_size)
+
+    def warm_up(self):
+        # CachedEmbeddings loads MiniLM lazily; pay that cost now, not on the first request
+        self.embedding_model.model.embed_query("warm up")
+        self.search("warm up")
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._embedding_cache.clear()
+        self._result_cache.clear()
+
+    def embed_query(self, query):
+        key = normalize_query(query)
+        embedding = self._embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embedding_model.embed_query(key)
+            self._embedding_cache.put(key, embedding)
+        return embedding
+
+    def search(self, query, k=None):
+        """
+        Returns up to k results as (content, metadata, score) tuples, best first.
+        The score is the store's distance in dense mode and the fused
+        reciprocal-rank score in hybrid mode.
+        """
+        k = k or self.k
+        key = (normalize_query(query), k)
+        results = self._result_cache.get(key)
+        if results is None:
+            if self.bm25 is not None:
+                results = self._hybrid_search(query, k)
+            else:
+                results = self._dense_search(query, k)
+            self._result_cache.put(key, results)
+        return results
+
+    def _dense_search(self, query, k):
+        embedding = self.embed_query(query)
+        hits = self.vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        return tuple((doc.page_content, doc.metadata, score) for doc, score in hits)
+
+    def _hybrid_search(self, query, k):
+        depth = max(k, HYBRID_CANDIDATES)
+        by_id = {}
+        for content, metadata, _ in self._dense_search(query, depth):
+            by_id.setdefault(_result_id(content, metadata), (content, metadata))
+        sparse = [cid for cid, _ in self.bm25.search(query, k=depth)]
+        fused = reciprocal_rank_fusion([list(by_id), sparse])[:k]
+
+        # Exact-term hits the dense ranking missed still need their text
+        missing = [cid for cid, _ in fused if cid not in by_id]
+        if missing:
+            stored = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for cid, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                by_id[cid] = (content, metadata)
+        return tuple((*by_id[cid], score) for cid, score in fused if cid in by_id)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    cache.put_many(["a", "b"], [[1, 2, 3, 4], [5, 6, 7, 8]])
+    return cache
+
+
+def test_round_trip(cache):
+    a, b, missing = cache.get_many(["a", "b", "c"])
+    np.testing.assert_array_equal(a, [1, 2, 3, 4])
+    np.testing.assert_array_equal(b, [5, 6, 7, 8])
+    assert missing is None
+
+
+def test_partial_vector_row_is_truncated(cache):
+    # Fewer stray bytes than one row: the next append must still start row-aligned
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\x01" * 7)
+    cache.put_many(["z"], [[1, 2, 3, 4]])
+    np.testing.assert_array_equal(cache.get_many(["z"])[0], [1, 2, 3, 4])
+    np.testing.assert_array_equal(cache.get_many(["b"])[0], [5, 6, 7, 8])
+    assert os.path.getsize(cache.vectors_path) == 3 * 4 * 4
+
+
+def test_orphan_vector_row_is_truncated(cache):
+    # A writer that died between the vector and key appends
+    with open(cache.vectors_path, "ab") as f:
+        f.write(np.ones(4, dtype=np.float32).tobytes())
+    reopened = EmbeddingCache("test-model", cache_dir=os.path.dirname(cache.dir))
+    reopened.put_many(["z"], [[9, 9, 9, 9]])
+    np.testing.assert_array_equal(reopened.get_many(["z"])[0], [9, 9, 9, 9])
+    assert len(reopened) == 3
+
+
+def test_other_writers_rows_become_visible(cache):
+    other = EmbeddingCache("test-model", cache_dir=os.path.dirname(cache.dir))
+    other.put_many(["c"], [[0, 0, 0, 1]])
+    np.testing.assert_array_equal(cache.get_many(["c"])[0], [0, 0, 0, 1])
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("langchain_community")
+pytest.importorskip("sentence_transformers")
+
+from chunker import chunk_documents
+from embeddings import EMBEDDING_MODEL_NAME, load_embedding_model
+from loader import load_md_files
+from onnx_embeddings import FP32_FILENAME, INT8_FILENAME, PARITY_MIN_COSINE, OnnxEmbeddings, model_dir_for
+
+SAMPLE_CHUNKS = 16
+
+
+@pytest.fixture(scope="module")
+def texts():
+    chunks = chunk_documents(load_md_files())
+    return [doc.page_content for doc in chunks[:SAMPLE_CHUNKS]] + ["How do I choose between AI/ML and web dev?"]
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    try:
+        model = load_embedding_model("torch")
+    except OSError as e:  # model not downloaded and no network
+        pytest.skip(f"torch reference model unavailable: {e}")
+    return np.asarray(model.embed_documents(texts), dtype=np.float32)
+
+
+@pytest.mark.parametrize("filename", [INT8_FILENAME, FP32_FILENAME])
+def test_onnx_vectors_match_torch(texts, reference, filename):
+    if not os.path.exists(os.path.join(model_dir_for(EMBEDDING_MODEL_NAME), filename)):
+        pytest.skip(f"{filename} not exported; run `python bench_embeddings.py --backends onnx-int8` once")
+    model = OnnxEmbeddings(EMBEDDING_MODEL_NAME, quantized=(filename == INT8_FILENAME))
+
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    assert vectors.shape == reference.shape
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-4)
+
+    cosine = (vectors * reference).sum(axis=1) / np.linalg.norm(reference, axis=1)
+    assert cosine.min() >= PARITY_MIN_COSINE
+
+    # Batching only adds padding. Dynamic quantization scales activations per
+    # batch, so a query embedded on its own is close to, not equal to, its row.
+    query = np.asarray(model.embed_query(texts[-1]), dtype=np.float32)
+    assert float(query @ vectors[-1]) >= 0.999
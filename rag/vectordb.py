@@ -1,26 +1,91 @@
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from chunker import chunk_documents
-from loader import load_md_files
-from embeddings import get_embeddings
-
-CHROMA_PATH = "chroma_db"
-
-def create_vectorstore(embedded_docs, embedding_model):
-    texts = [doc["content"] for doc in embedded_docs]
-    metadatas = [doc["metadata"] for doc in embedded_docs]
-    
-    vectorstore = Chroma(
-        persist_directory=CHROMA_PATH,
+import os
+from manifest import chunk_id
+from flat_index import FlatIndex
+
+# Resolved against this file so the app can open the store from any working directory
+RAG_DIR = os.path.dirname(os.path.abspath(__file__))
+CHROMA_PATH = os.path.join(RAG_DIR, "chroma_db")
+FLAT_INDEX_PATH = os.path.join(RAG_DIR, "flat_index")
+FLAT_INT8_INDEX_PATH = os.path.join(RAG_DIR, "flat_index_int8")
+
+# "chroma" (default), "flat" (mmapped float32) or "flat-int8" (mmapped int8)
+VECTOR_BACKENDS = ("chroma", "flat", "flat-int8")
+DEFAULT_VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+def store_path(backend=None):
+    backend = backend or DEFAULT_VECTOR_BACKEND
+    if backend == "chroma":
+        return CHROMA_PATH
+    if backend == "flat":
+        return FLAT_INDEX_PATH
+    if backend == "flat-int8":
+        return FLAT_INT8_INDEX_PATH
+    raise ValueError(f"Unknown vector backend: {backend} (expected one of {VECTOR_BACKENDS})")
+
+def open_vectorstore(embedding_model, backend=None, path=None):
+    backend = backend or DEFAULT_VECTOR_BACKEND
+    path = path or store_path(backend)
+    if backend == "chroma":
+        # Imported here so flat-index workers never pay for Chroma's import
+        from langchain_community.vectorstores import Chroma
+        return Chroma(
+            persist_directory=path,
+            embedding_function=embedding_model
+        )
+    return FlatIndex(
+        path,
+        quantize=(backend == "flat-int8"),
         embedding_function=embedding_model
     )
-    
-    vectorstore.add_texts(texts, metadatas=metadatas)
+
+def upsert_chunks(vectorstore, ids, embedded_docs):
+    # Chroma rejects a batch that repeats an id, so identical chunks collapse to one
+    unique = dict(zip(ids, embedded_docs))
+    if not unique:
+        return
+    # Write the vectors we already computed; add_texts would embed every chunk again.
+    collection = vectorstore if isinstance(vectorstore, FlatIndex) else vectorstore._collection
+    collection.upsert(
+        ids=list(unique),
+        embeddings=[doc["embedding"] for doc in unique.values()],
+        documents=[doc["content"] for doc in unique.values()],
+        metadatas=[doc["metadata"] for doc in unique.values()],
+    )
+
+def update_chunk_metadata(vectorstore, ids, metadatas):
+    # Rewrites metadata without touching vectors or documents
+    unique = dict(zip(ids, metadatas))
+    if not unique:
+        return
+    collection = vectorstore if isinstance(vectorstore, FlatIndex) else vectorstore._collection
+    collection.update(ids=list(unique), metadatas=list(unique.values()))
+
+def delete_chunks(vectorstore, ids):
+    if ids:
+        vectorstore.delete(ids=list(ids))
+
+def clear_vectorstore(vectorstore):
+    delete_chunks(vectorstore, vectorstore.get(include=[])["ids"])
+
+def create_vectorstore(embedded_docs, embedding_model, ids=None):
+    if ids is None:
+        ids = [
+            chunk_id(os.path.basename(doc["metadata"].get("source", "")), doc["content"])
+            for doc in embedded_docs
+        ]
+
+    vectorstore = open_vectorstore(embedding_model)
+    upsert_chunks(vectorstore, ids, embedded_docs)
     vectorstore.persist()
     return vectorstore
 
-docs = load_md_files()
-chunked_docs = chunk_documents(docs)
-embedded_docs, embedding_model = get_embeddings(chunked_docs)
-vectorstore = create_vectorstore(embedded_docs, embedding_model)
-print("Vectorstore created and persisted.")
+if __name__ == "__main__":
+    from chunker import chunk_documents
+    from loader import load_md_files
+    from embeddings import get_embeddings
+
+    docs = load_md_files()
+    chunked_docs = chunk_documents(docs)
+    embedded_docs, embedding_model = get_embeddings(chunked_docs)
+    vectorstore = create_vectorstore(embedded_docs, embedding_model)
+    print("Vectorstore created and persisted.")